@@ -1,16 +1,49 @@
 """
 Defines the FIVEx web application
 """
+import os
+
+import click
 import flask
+from flask.json.provider import DefaultJSONProvider
 
+from fivex import model
 from fivex.api import api_blueprint
 from fivex.frontend import views_blueprint
 
+try:
+    # Optional speedup features
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None  # type: ignore
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serialize responses with orjson. Region queries can return hundreds of thousands of variants, and encoding them
+    with the standard library takes longer than reading and parsing the data.
+
+    Unlike the standard library, non-finite floats (NaN, Infinity) are written as `null`, which is valid JSON.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(
+            obj, default=kwargs.get("default", self.default), option=option
+        ).decode()
+
 
 def create_app(settings_module="fivex.settings.dev"):
     """Application factory (allows different settings for dev, prod, or test environments)"""
     app = flask.Flask(__name__)
     app.config.from_object(settings_module)
+    model.init_app(app)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
 
     # This flask app implements a JSON API, and is presented via proxy as, eg `/api/data` and `/api/views`
     # In prod, the proxy is handled by apache. In development, vue handles it. This means that for development,
@@ -18,6 +51,21 @@ def create_app(settings_module="fivex.settings.dev"):
     app.register_blueprint(api_blueprint, url_prefix="/data")
     app.register_blueprint(views_blueprint, url_prefix="/views")
 
+    @app.cli.command("index-best-variants")
+    def index_best_variants():
+        """
+        One-time setup: add covering indexes to the best-variant lookup databases
+
+        Running workers open these files as immutable, so restart them after indexing.
+        """
+        for data_type in ("ge", "txrev"):
+            path = model.get_best_per_variant_lookup(data_type=data_type)
+            if not os.path.isfile(path):
+                click.echo(f"Skipping missing database: {path}")
+                continue
+            model.add_best_variant_index(data_type=data_type)
+            click.echo(f"Indexed: {path}")
+
     if app.config["SENTRY_DSN"]:
         # Only activate sentry if it is configured for this app
         import sentry_sdk  # type: ignore
@@ -1,7 +1,6 @@
 import dataclasses as dc
-import gzip
-import json
 import math
+import sys
 import typing as ty
 
 from zorp import parser_utils, readers  # type: ignore
@@ -103,6 +102,11 @@ TISSUES_TO_SYSTEMS = {
     "uterus": "Reproductive",
     "vagina": "Reproductive",
 }
+# Every parsed row references one of a handful of system names. Intern them so that all rows share one copy of each.
+TISSUES_TO_SYSTEMS = {
+    tissue: sys.intern(system) for tissue, system in TISSUES_TO_SYSTEMS.items()
+}
+_UNKNOWN_SYSTEM = sys.intern("Unknown")
 
 # A list of the tissue names associated with each study
 # TODO: It would be nice if there were a list-of-studies API that showed context / metadata, so people knew what they were looking at.
@@ -113,6 +117,25 @@ TISSUES_PER_STUDY = {
 }
 
 
+def _parse_pval_to_log(value: str) -> ty.Optional[float]:
+    """
+    Convert a p-value string to -log10(p). Ordinary p-values take a short path; anything else (missing values, zero or
+    underflow, out of range) is left to zorp, which knows how to handle them.
+    """
+    try:
+        val = float(value)
+    except ValueError:
+        return parser_utils.parse_pval_to_log(value, is_neg_log=False)
+    if 0 < val <= 1:
+        return -math.log10(val)
+    return parser_utils.parse_pval_to_log(value, is_neg_log=False)
+
+
+# One container is created per row read from disk. Where supported (Python 3.10+), slots make them smaller and
+#   faster to access
+_CONTAINER_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
 def position_to_variant_id(
     chromosome: str, position: int, ref_allele: str, alt_allele: str
 ) -> str:
@@ -120,7 +143,16 @@ def position_to_variant_id(
     return f"{chromosome}:{position:,}_{ref_allele}/{alt_allele}"
 
 
-@dc.dataclass
+def position_to_epacts_id(
+    chromosome: str, position: int, ref_allele: str, alt_allele: str
+) -> str:
+    """EPACTS-format variant ID, without display formatting. This is built for every row, so keep it cheap."""
+    return (
+        chromosome + ":" + str(position) + "_" + ref_allele + "/" + alt_allele
+    )
+
+
+@dc.dataclass(**_CONTAINER_OPTIONS)
 class CIContainer:
     """
     Represents the data for credible intervals
@@ -172,11 +204,10 @@ class CIContainer:
     rsid: ty.Optional[str] = None
     symbol: ty.Optional[str] = None
 
-    variant_id: str = dc.field(init=False)
-
-    def __post_init__(self):
-        # Add calculated fields
-        self.variant_id = position_to_variant_id(
+    @property
+    def variant_id(self) -> str:
+        # chrom:pos_ref/alt
+        return position_to_epacts_id(
             self.chromosome, self.position, self.ref_allele, self.alt_allele
         )
 
@@ -191,10 +222,46 @@ class CIContainer:
             return 10 ** -self.log_pvalue
 
     def to_dict(self):
-        return dc.asdict(self)
-
-
-@dc.dataclass
+        # Spelled out by hand: dc.asdict deep-copies every value, which adds up when serializing many rows
+        return {
+            "study": self.study,
+            "tissue": self.tissue,
+            "gene_id": self.gene_id,
+            "var_id": self.var_id,
+            "chromosome": self.chromosome,
+            "position": self.position,
+            "ref_allele": self.ref_allele,
+            "alt_allele": self.alt_allele,
+            "cs_id": self.cs_id,
+            "cs_index": self.cs_index,
+            "finemapped_region": self.finemapped_region,
+            "pip": self.pip,
+            "z": self.z,
+            "cs_min_r2": self.cs_min_r2,
+            "cs_avg_r2": self.cs_avg_r2,
+            "cs_size": self.cs_size,
+            "posterior_mean": self.posterior_mean,
+            "posterior_sd": self.posterior_sd,
+            "cs_log10bf": self.cs_log10bf,
+            "ma_samples": self.ma_samples,
+            "maf": self.maf,
+            "log_pvalue": self.log_pvalue,
+            "beta": self.beta,
+            "stderr_beta": self.stderr_beta,
+            "type": self.type,
+            "ac": self.ac,
+            "an": self.an,
+            "r2": self.r2,
+            "mol_trait_obj_id": self.mol_trait_obj_id,
+            "gid": self.gid,
+            "median_tpm": self.median_tpm,
+            "rsid": self.rsid,
+            "symbol": self.symbol,
+            "variant_id": self.variant_id,
+        }
+
+
+@dc.dataclass(**_CONTAINER_OPTIONS)
 class VariantContainer:
     """
     Represent the data for a single variant
@@ -205,7 +272,7 @@ class VariantContainer:
     # Study and tissue are not present in study- and tissue-specific files -- these two fields are only present in merged files
     study: str
     tissue: str
-    txrevise_event: str
+    txrevise_event: ty.Optional[str]  # Only present for txrevise (sQTL) data
 
     chromosome: str
     position: int
@@ -224,13 +291,9 @@ class VariantContainer:
     ac: int
     an: int
 
-    # r2: This field may contain 'NA's - we are not using this field at the moment;
-    # if we do we will need to parse those NAs
-    r2: dc.InitVar[float]
-    molecular_trait_object_id: dc.InitVar[str]
-
+    # The r2, molecular_trait_object_id, and median_tpm columns are not used, and are dropped by the parser.
+    #   (if we ever use r2, note that it may contain 'NA's)
     gene_id: str
-    median_tpm: dc.InitVar[float]
     rsid: str
     # end fields that are read from tabix index
 
@@ -240,28 +303,36 @@ class VariantContainer:
     tss_position: int
     symbol: str
     system: str
-    transcript: str
+    transcript: ty.Optional[str]  # Only present for txrevise (sQTL) data
 
-    # Additional optional args with updated fields from SuSiE
-    cs_index: ty.Optional[str] = None
-    cs_size: ty.Optional[int] = None
-    pip: ty.Optional[float] = None
+    # Additional optional args with updated fields from SuSiE. The defaults describe a variant that is not part of
+    #   any credible set, so that CIAdder only has to touch variants that are.
+    cs_index: str = "-"
+    cs_size: int = 0
+    pip: float = 0.0
 
     # Computed properties, not passed as param to init
-    variant_id: str = dc.field(init=False)  # chrom:pos_ref/alt
     samples: int = dc.field(init=False)
-    studytissue: str = dc.field(init=False)
 
-    def __post_init__(self, a, b, c):
+    def __post_init__(self):
         # Add calculated fields
-        self.variant_id = position_to_variant_id(
-            self.chromosome, self.position, self.ref_allele, self.alt_allele
-        )
-        self.samples = self.an / 2
+        # an counts two alleles per (diploid) sample
+        self.samples = self.an >> 1
         # FIXME: why do we accept constructor arg if never used?
         self.build = "GRCh38"
-        # A synthetic field used on the front-end to group together points based on both study and tissue TODO Move to frontend only; this doesn't need to be in the API
-        self.studytissue = f"{self.study}-{self.tissue}"
+
+    @property
+    def variant_id(self) -> str:
+        # chrom:pos_ref/alt. Only computed when asked for, since many uses of a row never need it
+        return position_to_epacts_id(
+            self.chromosome, self.position, self.ref_allele, self.alt_allele
+        )
+
+    @property
+    def studytissue(self) -> str:
+        # Groups together points based on both study and tissue. The front-end computes its own copy, so this is not
+        #   sent by the API
+        return f"{self.study}-{self.tissue}"
 
     @property
     def pvalue(self):
@@ -274,7 +345,38 @@ class VariantContainer:
             return 10 ** -self.log_pvalue
 
     def to_dict(self):
-        return dc.asdict(self)
+        # Spelled out by hand: dc.asdict deep-copies every value, which adds up when serializing many rows
+        return {
+            "study": self.study,
+            "tissue": self.tissue,
+            "txrevise_event": self.txrevise_event,
+            "chromosome": self.chromosome,
+            "position": self.position,
+            "ref_allele": self.ref_allele,
+            "alt_allele": self.alt_allele,
+            "variant": self.variant,
+            "ma_samples": self.ma_samples,
+            "maf": self.maf,
+            "log_pvalue": self.log_pvalue,
+            "beta": self.beta,
+            "stderr_beta": self.stderr_beta,
+            "vartype": self.vartype,
+            "ac": self.ac,
+            "an": self.an,
+            "gene_id": self.gene_id,
+            "rsid": self.rsid,
+            "build": self.build,
+            "tss_distance": self.tss_distance,
+            "tss_position": self.tss_position,
+            "symbol": self.symbol,
+            "system": self.system,
+            "transcript": self.transcript,
+            "cs_index": self.cs_index,
+            "cs_size": self.cs_size,
+            "pip": self.pip,
+            "variant_id": self.variant_id,
+            "samples": self.samples,
+        }
 
 
 class CIAdder:
@@ -323,46 +425,48 @@ class CIAdder:
                 readFlag = False
         if readFlag:
             for row in ciRows:
-                key = ":".join(
-                    [
-                        row.chromosome,
-                        str(row.position),
-                        row.ref_allele,
-                        row.alt_allele,
-                        row.study,
-                        row.tissue,
-                        row.gene_id,
-                    ]
+                key = (
+                    row.chromosome,
+                    row.position,
+                    row.ref_allele,
+                    row.alt_allele,
+                    row.study,
+                    row.tissue,
+                    row.gene_id,
                 )
-                # Dictionary Format: ci_Dict[chrom:pos:ref:alt:study:tissue:gene_id] = (cs_index, cs_size, pip)
+                # Dictionary Format: ci_Dict[(chrom, pos, ref, alt, study, tissue, gene_id)] = (cs_index, cs_size, pip)
                 ci_data[key] = (row.cs_index, row.cs_size, row.pip)
             self.ci_data = ci_data
         else:
             self.ci_data = {}
 
+    def annotate(
+        self, variants: ty.Iterable[VariantContainer]
+    ) -> ty.Iterable[VariantContainer]:
+        """Add credible set statistics to a whole batch of variants"""
+        if not self.ci_data:
+            # Nothing was fine-mapped in this region, so there is no need to visit each variant
+            return variants
+        return map(self, variants)
+
     def __call__(self, variant: VariantContainer) -> VariantContainer:
-        default = ("-", 0, 0.0)
-        if self.ci_data == {}:
-            # cs_index is our new cluster (L1 or L2); we will repurpose spip with cs_size for the size of the cluster
-            (cs_index, cs_size, pip) = default
-        else:
-            (cs_index, cs_size, pip) = self.ci_data.get(
-                ":".join(
-                    [
-                        variant.chromosome,
-                        str(variant.position),
-                        variant.ref_allele,
-                        variant.alt_allele,
-                        variant.study,
-                        variant.tissue,
-                        variant.gene_id,
-                    ]
-                ),
-                default,  # Some variants may lack information
+        if not self.ci_data:
+            # Nothing was fine-mapped in this region: every variant keeps the container defaults
+            return variant
+        ci = self.ci_data.get(
+            (
+                variant.chromosome,
+                variant.position,
+                variant.ref_allele,
+                variant.alt_allele,
+                variant.study,
+                variant.tissue,
+                variant.gene_id,
             )
-        variant.cs_index = cs_index
-        variant.cs_size = cs_size
-        variant.pip = pip
+        )
+        if ci is not None:
+            # cs_index is our new cluster (L1 or L2); we will repurpose spip with cs_size for the size of the cluster
+            (variant.cs_index, variant.cs_size, variant.pip) = ci
         return variant
 
 
@@ -406,45 +510,117 @@ class CIParser:
         # median_tpm
         # rsid
         # gene_symbol (short gene name, e.g. "SORT1")
-        fields: ty.List[ty.Any] = row.split("\t")
+        fields = row.split("\t")
         if self.study and self.tissue:
             # Tissue-and-study-specific files have two fewer columns (study and tissue),
             # and so the fields must be appended to match the number of fields in the all-tissue file
-            fields = [self.study, self.tissue] + fields
-        fields[5] = int(fields[5])  # pos
-        fields[11] = float(fields[11])  # pip
-        fields[12] = float(fields[12])  # z
-        fields[13] = float(fields[13])  # cs_min_r2
-        fields[14] = float(fields[14])  # cs_avg_r2
-        fields[15] = int(fields[15])  # cs_size
-        fields[16] = float(fields[16])  # posterior_mean
-        fields[17] = float(fields[17])  # posteriof_sd
-        fields[18] = float(fields[18])  # cs_log10bf
+            fields = [self.study, self.tissue, *fields]
+        (
+            study,
+            tissue,
+            gene_id,
+            var_id,
+            chromosome,
+            pos,
+            ref,
+            alt,
+            cs_id,
+            cs_index,
+            finemapped_region,
+            pip,
+            z,
+            cs_min_r2,
+            cs_avg_r2,
+            cs_size,
+            posterior_mean,
+            posterior_sd,
+            cs_log10bf,
+        ) = fields[:19]
         # Extra fields from joined file
+        extra: ty.Tuple[ty.Any, ...] = ()
         if len(fields) > 19:
-            fields[19] = int(fields[19])  # ma_samples
-            fields[20] = float(fields[20])  # maf
-            fields[21] = parser_utils.parse_pval_to_log(
-                fields[21], is_neg_log=False
-            )  # pvalue
-            fields[22] = float(fields[22])  # beta
-            fields[23] = float(fields[23])  # se
-            fields[25] = int(fields[25])  # ac
-            fields[26] = int(fields[26])  # an
-            fields[30] = float(fields[30])  # median_tpm
-        return CIContainer(*fields)
+            (
+                ma_samples,
+                maf,
+                pvalue,
+                beta,
+                se,
+                vartype,
+                ac,
+                an,
+                r2,
+                mol_trait_obj_id,
+                gid,
+                median_tpm,
+                rsid,
+                symbol,
+            ) = fields[19:]
+            extra = (
+                int(ma_samples),
+                float(maf),
+                _parse_pval_to_log(pvalue),
+                float(beta),
+                float(se),
+                vartype,
+                int(ac),
+                int(an),
+                r2,
+                mol_trait_obj_id,
+                gid,
+                float(median_tpm),
+                rsid,
+                symbol,
+            )
+        return CIContainer(
+            study,
+            tissue,
+            gene_id,
+            var_id,
+            chromosome,
+            int(pos),
+            ref,
+            alt,
+            cs_id,
+            cs_index,
+            finemapped_region,
+            float(pip),
+            float(z),
+            float(cs_min_r2),
+            float(cs_avg_r2),
+            int(cs_size),
+            float(posterior_mean),
+            float(posterior_sd),
+            float(cs_log10bf),
+            *extra,
+        )
 
 
 class VariantParser:
     def __init__(self, tissue=None, study=None, pipDict=None, datatype=None):
-        # We only need to load the gene locator once per usage, not on every line parsed
+        # Lookup tables are loaded once per process and shared, not re-read for every query or line parsed
         self.gene_json = model.get_gene_names_conversion()
+        self.tss_dict = model.get_tss_data()
         self.tissue = tissue
         self.study = study
         self.pipDict = pipDict
         self.datatype = datatype
-        with gzip.open(model.locate_tss_data(), "rb") as f:
-            self.tss_dict = json.load(f)
+
+        # Work out everything that is the same for every row of the query once, here, rather than per row
+        if tissue and study:
+            # Tissue-and-study-specific files have two fewer columns (study and tissue)
+            self.fixed_columns: ty.Optional[ty.Tuple[str, str, str]] = (
+                study,
+                tissue,
+                TISSUES_TO_SYSTEMS.get(tissue, _UNKNOWN_SYSTEM),
+            )
+        else:
+            self.fixed_columns = None
+        # Only spliceQTL (txrevise) data identifies a transcript
+        self.has_transcripts = datatype != "ge"
+
+        # TSS and symbol depend only on the gene, and a query returns many rows per gene. Look up each gene once.
+        #   Format: gene_id -> (strand sign, abs(TSS), symbol)
+        self.gene_annotations: ty.Dict[str, ty.Tuple[float, float, str]] = {}
 
     def __call__(self, row: str) -> VariantContainer:
 
@@ -456,95 +632,140 @@ class VariantParser:
 
         The parser is the piece tied to file format, so this must change if the file format changes!
         """
-        fields: ty.List[ty.Any] = row.split("\t")
         # Revise if data format changes!
-        # fields[1] = fields[1].replace("chr", "")  # chrom
-        if self.tissue and self.study:
-            # Tissue-and-study-specific files have two fewer columns (study and tissue),
-            # and so the fields must be appended to match the number of fields in the all-tissue file
-            tissuevar = self.tissue
-            fields = [self.study, tissuevar] + fields
+        if self.fixed_columns is not None:
+            (study, tissuevar, tissueSystem) = self.fixed_columns
+            columns = row
         else:
-            tissuevar = fields[1]
-
-        # Field numbers. See also: https://github.com/eQTL-Catalogue/eQTL-Catalogue-resources/blob/master/tabix/Columns.md
-        # 0: study
-        # 1: tissue
-        # 2: molecular_trait_id
-        #  for spliceQTLs, this looks like 'ENSG00000008128.grp_1.contained.ENST00000356200'
-        # 3: chromosome
-        # 4: position (int)
-        # 5: ref
-        # 6: alt
-        # 7: variant (chr_pos_ref_alt)
-        # 8: ma_samples (int)
-        # 9: maf (float)
-        # 10: pvalue (float)
-        # 11: beta (float)
-        # 12: se (float)
-        # 13: type (SNP, INDEL, etc)
-        # 14: ac (allele count) (int)
-        # 15: an (total number of alleles = 2 * sample size) (int)
-        # 16: r2 (float)
-        # 17: molecular_trait_object_id
-        #  for spliceQTLs, this looks like 'ENSG00000008128.contained'
-        # 18: gene_id (ENSG#)
-        # 19: median_tpm (float)
-        # 20: rsid
-        if self.datatype == "ge":
-            fields[2] = None
-        fields[4] = int(fields[4])  # pos
-        fields[8] = int(fields[8])  # ma_samples
-        fields[9] = float(fields[9])  # maf
-        fields[10] = parser_utils.parse_pval_to_log(
-            fields[10], is_neg_log=False
-        )  # pvalue_nominal --> serialize as log
-        fields[11] = float(fields[11])  # beta
-        fields[12] = float(fields[12])  # stderr_beta
-        fields[14] = int(fields[14])  # allele_count
-        fields[15] = int(fields[15])  # total_number_of_alleles
-        try:
-            fields[16] = float(fields[16])  # r2
-        except ValueError:
-            # TODO: Make the "NA" -> None check more explicit
-            fields[16] = None
-        fields[19] = float(fields[19])  # median_tpm  # FIXME: Handle NA case
+            # The all-tissue files start with two extra columns: study and tissue
+            (study, tissuevar, columns) = row.split("\t", 2)
+            tissueSystem = TISSUES_TO_SYSTEMS.get(tissuevar, _UNKNOWN_SYSTEM)
+
+        # Columns, in order. See also: https://github.com/eQTL-Catalogue/eQTL-Catalogue-resources/blob/master/tabix/Columns.md
+        (
+            # for spliceQTLs, this looks like 'ENSG00000008128.grp_1.contained.ENST00000356200'
+            molecular_trait_id,
+            chromosome,
+            position,  # int
+            ref,
+            alt,
+            variant,  # chr_pos_ref_alt
+            ma_samples,  # int
+            maf,  # float
+            pvalue,  # float
+            beta,  # float
+            se,  # float
+            vartype,  # SNP, INDEL, etc
+            ac,  # allele count (int)
+            an,  # total number of alleles = 2 * sample size (int)
+            _,  # r2 (float, or 'NA')
+            # molecular_trait_object_id: for spliceQTLs, this looks like 'ENSG00000008128.contained'
+            _,
+            gene_id,  # ENSG#
+            _,  # median_tpm (float)
+            rsid,
+        ) = columns.split("\t")
+        position = int(position)
 
         # Append build
         build = "GRCh38"
 
-        # Append tss_distance
-        gene_tss = self.tss_dict.get(fields[18].split(".")[0], float("nan"))
-        tss_distance = math.copysign(1, gene_tss) * (fields[4] - abs(gene_tss))
-        tss_position = -abs(gene_tss)
-
-        # Append gene symbol
-        geneSymbol = self.gene_json.get(
-            fields[18].split(".")[0], "Unknown_gene"
-        )
+        # Append tss_distance and gene symbol
+        annotation = self.gene_annotations.get(gene_id)
+        if annotation is None:
+            gene_prefix = gene_id.partition(".")[0]
+            gene_tss = self.tss_dict.get(gene_prefix, float("nan"))
+            annotation = (
+                math.copysign(1, gene_tss),
+                abs(gene_tss),
+                self.gene_json.get(gene_prefix, "Unknown_gene"),
+            )
+            self.gene_annotations[gene_id] = annotation
+        (tss_sign, tss_abs, geneSymbol) = annotation
+        tss_distance = tss_sign * (position - tss_abs)
+        tss_position = -tss_abs
 
         # Add tissue grouping and sample size from GTEx
         # tissue_data = TISSUE_DATA.get(tissuevar, ("Unknown_Tissue", None))
         # fields.extend(tissue_data)
 
-        # Append system information
-        tissueSystem = TISSUES_TO_SYSTEMS.get(tissuevar, "Unknown")
-        if fields[2] is not None:
-            (_, _, _, transcript) = fields[2].split(".")
+        if self.has_transcripts:
+            txrevise_event = molecular_trait_id
+            (_, _, _, transcript) = molecular_trait_id.split(".")
         else:
+            txrevise_event = None
             transcript = None
 
-        fields.extend(
-            [
-                build,
-                tss_distance,
-                tss_position,
-                geneSymbol,
-                tissueSystem,
-                transcript,
-            ]
+        return VariantContainer(
+            study,
+            tissuevar,
+            txrevise_event,
+            chromosome,
+            position,
+            ref,
+            alt,
+            variant,
+            int(ma_samples),
+            float(maf),
+            # pvalue_nominal --> serialize as log
+            _parse_pval_to_log(pvalue),
+            float(beta),
+            float(se),
+            vartype,
+            int(ac),
+            int(an),
+            gene_id,
+            rsid,
+            build,
+            tss_distance,
+            tss_position,
+            geneSymbol,
+            tissueSystem,
+            transcript,
         )
-        return VariantContainer(*fields)
+
+
+class PrefilteredTabixReader(readers.TabixReader):
+    """
+    A tabix reader that can discard raw lines of text before they are parsed
+
+    Parsing is the most expensive step of reading a region. When a query only keeps a small subset of rows (eg one
+    gene out of a whole region), a cheap text test can skip most of that work. A line filter must never reject a row
+    that the regular (parsed) filters would keep: it is a shortcut, not a replacement.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PrefilteredTabixReader, self).__init__(*args, **kwargs)
+        self._line_filters: ty.List[ty.Callable[[str], bool]] = []
+
+    def add_line_filter(
+        self, test_func: ty.Callable[[str], bool]
+    ) -> "PrefilteredTabixReader":
+        self._line_filters.append(test_func)
+        return self
+
+    # Overrides a private method of zorp==0.2.0 (pinned in requirements/base.txt), where `fetch` passes the raw
+    #   pysam iterator through `_make_generator` for parsing. Check this against the base class when upgrading zorp.
+    def _make_generator(self, iterator: ty.Iterator[str]) -> ty.Iterator:
+        if self._line_filters:
+            iterator = (
+                row
+                for row in iterator
+                if all(test_func(row) for test_func in self._line_filters)
+            )
+        return super(PrefilteredTabixReader, self)._make_generator(iterator)
+
+
+def is_significant_in_credible_set(variant: VariantContainer) -> bool:
+    """
+    Whether a variant is part of a credible set (PIP > 0) and genomewide significant (p < 5e-8). Must be applied
+    after credible set statistics have been added (see CIAdder).
+    """
+    return (
+        variant.pip > 0.0
+        and variant.log_pvalue is not None
+        and variant.log_pvalue > 7.30103
+    )
 
 
 def query_variants(
@@ -581,7 +802,7 @@ def query_variants(
         source = model.locate_data(chrom, start, datatype=datatype)
 
     # Directly pass this PIP dictionary to VariantParser to add cluster, SPIP, and PIP values to data points
-    reader = readers.TabixReader(
+    reader = PrefilteredTabixReader(
         # The new EBI data format has no header row for the merged files, but a header row for the original data
         source,
         parser=VariantParser(tissue=tissue, study=study, datatype=datatype),
@@ -600,24 +821,22 @@ def query_variants(
         tissue=tissue,
         gene_id=gene_id,
     )
-    reader.add_transform(ci_adder)
     
     if gene_id:
         # The internal data storage no longer includes gene version (id.version)
         # We will modify the input query accordingly to remove any version numbers
-        if "." in gene_id:
-            reader.add_filter("gene_id", gene_id.split(".")[0])
-        else:
-            reader.add_filter("gene_id", gene_id)
-            # reader.add_filter(
-            #     lambda result: result.gene_id.split(".")[0] == gene_id
-            # )
+        gene_id = gene_id.partition(".")[0]
+        reader.add_filter("gene_id", gene_id)
+        # A region holds rows for many genes. The gene_id column is never the last one, so it is always tab-delimited.
+        gene_id_column = f"\t{gene_id}\t"
+        reader.add_line_filter(lambda row: gene_id_column in row)
 
     if transcript:
-        if "." in transcript:
-            reader.add_filter("transcript", transcript.split(".")[0])
-        else:
-            reader.add_filter("transcript", transcript)
+        transcript = transcript.partition(".")[0]
+        reader.add_filter("transcript", transcript)
+        # The transcript is the last part of the molecular_trait_id column (eg 'ENSG...grp_1.contained.ENST...')
+        transcript_suffix = f".{transcript}\t"
+        reader.add_line_filter(lambda row: transcript_suffix in row)
 
     if end is None:
         # Small hack: when asking for a single point, Pysam sometimes returns more data than expected for half-open
@@ -627,24 +846,25 @@ def query_variants(
     #reader.add_filter("maf")
     #reader.add_filter(lambda result: result.maf > 0.0)
 
-    # PIP === 0.0 only if the data point is missing in the DAP-G database.
-    # Using this filter returns only points which are found in the DAP-G database,
-    # and only for points which are genomewide significant (p-value < 5e-8)
-    if piponly:
-        reader.add_filter("pip")
-        reader.add_filter(lambda result: result.pip > 0.0)
-        reader.add_filter("log_pvalue")
-        reader.add_filter(lambda result: result.log_pvalue > 7.30103)
-
     if end is None:
         # Single variant query
         try:
-            return reader.fetch(chrom, start - 1, start + 1)
+            variants = reader.fetch(chrom, start - 1, start + 1)
         except (ValueError, FileNotFoundError):
             return []
     else:
         # Region query
         try:
-            return reader.fetch(chrom, start - 1, end + 1)
+            variants = reader.fetch(chrom, start - 1, end + 1)
         except (ValueError, FileNotFoundError):
             return []
+
+    # Credible set statistics are only added to the rows that passed the filters above
+    variants = ci_adder.annotate(variants)
+
+    # PIP === 0.0 only if the data point is missing in the DAP-G database.
+    # Using this filter returns only points which are found in the DAP-G database,
+    # and only for points which are genomewide significant (p-value < 5e-8)
+    if piponly:
+        variants = filter(is_significant_in_credible_set, variants)
+    return variants
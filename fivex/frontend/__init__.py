@@ -1,10 +1,6 @@
 """
 Front end views: provide the data needed by pages that are visited in the web browser
 """
-import gzip
-import json
-import sqlite3
-
 from flask import Blueprint, abort, jsonify, redirect, request, url_for
 from genelocator import exception as gene_exc, get_genelocator  # type: ignore
 from zorp import readers  # type: ignore
@@ -75,11 +71,9 @@ def region_view():
     # If the request does not include a start or end position, then find the TSS and strand information,
     # then generate a window based on this information
     if start is None and end is None:
-        with gzip.open(model.locate_tss_data(), "rb") as f:
-            tss_dict = json.load(f)
-            # tss contains two pieces of information: the genomic position of the TSS, and the strand
-            # if it is the + strand, then the tss is positive; if it is the - strand, then the tss is negative
-        tss = tss_dict.get(gene_id, None)
+        # tss contains two pieces of information: the genomic position of the TSS, and the strand
+        # if it is the + strand, then the tss is positive; if it is the - strand, then the tss is negative
+        tss = model.get_tss_data().get(gene_id, None)
         if tss is None:
             return abort(400)
         else:
@@ -193,7 +187,7 @@ def variant_view(chrom: str, pos: int):
 
     # Query the best variant SQLite3 database to retrieve the top gene by PIP
     pipIndexErrorFlag = False
-    conn = sqlite3.connect(
+    conn = model.get_db_connection(
         model.get_best_per_variant_lookup(data_type=data_type)
     )
     with conn:
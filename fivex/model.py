@@ -1,25 +1,131 @@
 """
 Models/ datastores
 """
-import gzip
-import json
-import math
+import functools
 import os
+import re
 import sqlite3
+import threading
+import typing as ty
+from urllib.parse import quote
 
-from flask import abort, current_app
+from flask import abort
+
+try:
+    from orjson import loads as json_loads  # type: ignore
+except ImportError:
+    from json import loads as json_loads  # type: ignore
+
+try:
+    # Optional speedup features: ISA-L decompresses the lookup tables several times faster than zlib
+    from isal import igzip as gzip  # type: ignore
+except ImportError:
+    import gzip  # type: ignore
+
+# Snapshot of the app's FIVEX_DATA_DIR, taken by `init_app`. Paths are built on every request, and a module global
+#   is cheaper to read than app config through the `current_app` proxy.
+#   Unset until then, so that building a path outside of an app fails loudly (see `_memoize_path`).
+_data_dir: ty.Optional[str] = None
+# Fixed subdirectories of the data layout, joined once by `init_app` rather than every time a path is built
+_original_dir: ty.Optional[str] = None
+_gencode_dir: ty.Optional[str] = None
+_credible_sets_dir: ty.Optional[str] = None
+
+
+def init_app(app):
+    """Point the data store helpers at the data directory configured for this app"""
+    global _data_dir, _original_dir, _gencode_dir, _credible_sets_dir
+    _data_dir = app.config["FIVEX_DATA_DIR"]
+    _original_dir = os.path.join(_data_dir, "ebi_original")
+    _gencode_dir = os.path.join(_data_dir, "gencode")
+    _credible_sets_dir = os.path.join(_data_dir, "credible_sets")
+
+
+# SQLite connections are opened once per process and shared across requests. They are read-only (see below), so
+#   sharing them is safe, and it works regardless of how the server schedules requests: eg gevent workers run each
+#   request in its own greenlet, and would never reuse thread- (greenlet-) local connections.
+_db_connections: ty.Dict[str, sqlite3.Connection] = {}
+_db_connections_lock = threading.Lock()
+
+
+def get_db_connection(path: str) -> sqlite3.Connection:
+    """Get a (reusable) connection to one of our SQLite3 lookup databases"""
+    conn = _db_connections.get(path)
+    if conn is None:
+        with _db_connections_lock:
+            conn = _db_connections.get(path)
+            if conn is None:
+                conn = _db_connections[path] = _open_db(path)
+    return conn
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    # The lookup databases are static reference data: open them read-only, and tell SQLite the file will not
+    #   change so that it can skip file locking and journal checks on every query. (The app must be restarted if
+    #   the data is replaced)
+    conn = sqlite3.connect(
+        f"file:{quote(path)}?mode=ro&immutable=1",
+        uri=True,
+        check_same_thread=False,
+    )
+    # Keep up to ~64MB of pages in memory, so that hot pages stay cached between requests
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+# Whitelists for request values that become part of a file path. A value that does not match is rejected outright,
+#   rather than "cleaned up" into some other (valid) path.
+_CHROM_RE = re.compile(r"\A(?:[1-9]|1[0-9]|2[0-2]|X|Y|MT?)\Z")
+# Study, tissue, and datatype names, eg "GTEx", "macrophage_IFNg+Salmonella", "CD8_T-cell_anti-CD3-CD28"
+_NAME_RE = re.compile(r"\A[A-Za-z0-9][A-Za-z0-9_+-]*\Z")
+
+
+def _validate(pattern: re.Pattern, value: str) -> str:
+    if not isinstance(value, str) or not pattern.match(value):
+        abort(400)
+    return value
+
+
+def _memoize_path(func):
+    """
+    Cache the paths built by a `locate_*` helper. The directory layout is static, but the data directory can be
+    changed by `init_app`, so it is part of the cache key.
+    """
+
+    @functools.lru_cache(maxsize=4096)
+    def cached(data_dir, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _data_dir is None:
+            raise RuntimeError(
+                "The data directory is not set: create the app (which calls"
+                " `model.init_app`) before building data paths"
+            )
+        return cached(_data_dir, *args, **kwargs)
+
+    return wrapper
 
 
 # Merged data split into 1Mbps chunks - only query this for single variant data
 def locate_data(chrom: str, startpos: int, datatype: str = "ge"):
-    start = math.floor(startpos / 1000000) * 1000000 + 1
+    start = (startpos // 1_000_000) * 1_000_000 + 1
+    # Cache per chunk, rather than per (arbitrary) position
+    return _locate_data_chunk(chrom, start, datatype)
+
+
+@_memoize_path
+def _locate_data_chunk(chrom: str, start: int, datatype: str):
     end = start + 999999
 
-    # FIXME: Inject strict validation in callers before this ever hits this function
-    chrom = os.path.basename(chrom)
+    chrom = _validate(_CHROM_RE, chrom)
+    datatype = _validate(_NAME_RE, datatype)
 
+    # Set by the time this runs: `_memoize_path` checks it
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
+        ty.cast(str, _data_dir),
         f"ebi_{datatype}",
         chrom,
         f"all.EBI.{datatype}.data.chr{chrom}.{start}-{end}.tsv.gz",
@@ -27,13 +133,14 @@ def locate_data(chrom: str, startpos: int, datatype: str = "ge"):
 
 
 # Study- and tissue-specific data - query this for region view
+@_memoize_path
 def locate_study_tissue_data(study, tissue, datatype="ge"):
-    study = os.path.basename(study)
-    tissue = os.path.basename(tissue)
+    study = _validate(_NAME_RE, study)
+    tissue = _validate(_NAME_RE, tissue)
+    datatype = _validate(_NAME_RE, datatype)
 
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
-        "ebi_original",
+        _original_dir,
         datatype,
         study,
         f"{study}_{datatype}_{tissue}.all.tsv.gz",
@@ -41,164 +148,174 @@ def locate_study_tissue_data(study, tissue, datatype="ge"):
 
 
 # Signed tss data: positive TSS = Plus strand, negative TSS = Minus strand
+@_memoize_path
 def locate_tss_data():
-    return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"], "gencode", "tss.json.gz",
-    )
+    return os.path.join(_gencode_dir, "tss.json.gz")
 
 
 # Sorted and filtered gencode data
+@_memoize_path
 def locate_gencode_data():
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
-        "gencode",
+        _gencode_dir,
         "gencode.v30.annotation.gtf.genes.bed.gz",
     )
 
 
 # Sorted and filtered gencode transcripts data
+@_memoize_path
 def locate_gencode_transcript_data():
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
-        "gencode",
+        _gencode_dir,
         "gencode.v30.annotation.gtf.transcripts.bed.gz",
     )
 
 
 # A database that stores the point with the highest PIP at each variant
+@_memoize_path
 def get_best_per_variant_lookup(data_type: str = "ge",):
     # TODO: dedup datatype value usage. make enum with ge or txrev for e and sqtls
     """Get the path to an SQLite3 database file describing the best study,
     tissue, and gene for any given variant"""
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
-        "credible_sets",
+        ty.cast(str, _credible_sets_dir),
         data_type,
         "pip.best.variant.summary.sorted.indexed.sqlite3.db",
     )
 
 
-# Uses the database above to find the if Cartagene exists when there's a result. If not, returns GTEx, otherwise, returns Cartagene, even if it's not the best hit.
+# Covers every column read by `get_best_study_tissue_gene`, so that lookups can be answered from the index alone.
+#   The reference databases are read-only at runtime; this is applied once per deployment (`flask index-best-variants`)
+BEST_VARIANT_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_chrom_pos_study_pvalue ON sig "
+    "(chrom, pos, study, pvalue, pip, tissue, gene_id, ref, alt)"
+)
+
+
+def add_best_variant_index(data_type: str = "ge"):
+    """Add the covering index to the best-variant database for the given data type, if not already present"""
+    conn = sqlite3.connect(get_best_per_variant_lookup(data_type=data_type))
+    try:
+        with conn:
+            conn.execute(BEST_VARIANT_INDEX)
+            conn.execute("ANALYZE sig")
+    finally:
+        conn.close()
+
+
+# SQL for each combination of filters used by `get_best_study_tissue_gene`, keyed on which ones are set. Reusing
+#   the exact same text lets sqlite3's statement cache skip re-parsing and re-planning the query.
+_BEST_VARIANT_SQL: ty.Dict[ty.Tuple[bool, bool, bool, bool], str] = {}
+
+
+def _best_variant_sql(mask: ty.Tuple[bool, bool, bool, bool]) -> str:
+    sqlCommand = _BEST_VARIANT_SQL.get(mask)
+    if sqlCommand is None:
+        has_start, has_end, has_tissue, has_gene = mask
+        # Only the columns used below, so that the covering index (BEST_VARIANT_INDEX) can serve the query
+        sqlCommand = (
+            "SELECT pip, study, tissue, gene_id, chrom, pos, ref, alt"
+            " FROM sig WHERE chrom=?"
+        )
+        if has_start:
+            if has_end:
+                sqlCommand += " AND pos BETWEEN ? AND ?"
+            else:
+                sqlCommand += " AND pos=?"
+        if has_tissue:
+            sqlCommand += " AND tissue=?"
+        if has_gene:
+            sqlCommand += " AND gene_id=?"
+        # (study = 'Cartagene') is 1 or 0, so Cartagene rows sort first
+        sqlCommand += (
+            " ORDER BY (study = 'Cartagene') DESC, pvalue ASC LIMIT 1"
+        )
+        _BEST_VARIANT_SQL[mask] = sqlCommand
+    return sqlCommand
+
+
+# Uses the database above to find the best hit, preferring Cartagene: if Cartagene has any result, return its best
+#   one, even if it's not the best hit overall. Otherwise, return the best hit from any study.
+# NOTE: `study` is not used as a filter; the Cartagene preference takes its place.
 def get_best_study_tissue_gene(
     chrom, start=None, end=None, study=None, tissue=None, gene_id=None
 ):
-    conntest = sqlite3.connect(get_best_per_variant_lookup())
-    study_test="Cartagene"
-    with conntest:
-        try:
-            cursor = conntest.cursor()
-            sqlCommand_test = "SELECT * FROM sig WHERE chrom=?"
-            argsList = [chrom]
-            if start is not None:
-                if end is not None:
-                    sqlCommand_test += " AND pos BETWEEN ? AND ?"
-                    argsList.extend([start, end])
-                else:
-                    sqlCommand_test += " AND pos=?"
-                    argsList.append(start)
-            if study_test is not None:
-                sqlCommand_test += " AND study=?"
-                argsList.append(study_test)
-            if tissue is not None:
-                sqlCommand_test += " AND tissue=?"
-                argsList.append(tissue)
-            if gene_id is not None:
-                sqlCommand_test += " AND gene_id=?"
-                argsList.append(gene_id)
-            sqlCommand_test += " ORDER BY pvalue LIMIT 1"
-            (
-                pvalue,
-                study,
-                tissue,
-                gene_id,
-                chrom,
-                pos,
-                ref,
-                alt,
-                _,
-                _,
-                _,
-            ) = list(cursor.execute(sqlCommand_test, tuple(argsList),))[0]
-            study = "Cartagene"
-        except IndexError:
-            study = None
-            
-    conn = sqlite3.connect(get_best_per_variant_lookup())
+    has_start = start is not None
+    has_end = has_start and end is not None
+    has_tissue = tissue is not None
+    has_gene = gene_id is not None
+    sqlCommand = _best_variant_sql((has_start, has_end, has_tissue, has_gene))
+
+    argsList = [chrom]
+    if has_start:
+        argsList.append(start)
+        if has_end:
+            argsList.append(end)
+    if has_tissue:
+        argsList.append(tissue)
+    if has_gene:
+        argsList.append(gene_id)
+
+    conn = get_db_connection(get_best_per_variant_lookup())
     with conn:
-        try:
-            cursor = conn.cursor()
-            sqlCommand = "SELECT * FROM sig WHERE chrom=?"
-            argsList = [chrom]
-            if start is not None:
-                if end is not None:
-                    sqlCommand += " AND pos BETWEEN ? AND ?"
-                    argsList.extend([start, end])
-                else:
-                    sqlCommand += " AND pos=?"
-                    argsList.append(start)
-            if study is not None:
-                sqlCommand += " AND study=?"
-                argsList.append(study)
-            if tissue is not None:
-                sqlCommand += " AND tissue=?"
-                argsList.append(tissue)
-            if gene_id is not None:
-                sqlCommand += " AND gene_id=?"
-                argsList.append(gene_id)
-            sqlCommand += " ORDER BY pvalue LIMIT 1"
-            (
-                pvalue,
-                study,
-                tissue,
-                gene_id,
-                chrom,
-                pos,
-                ref,
-                alt,
-                _,
-                _,
-                _,
-            ) = list(cursor.execute(sqlCommand, tuple(argsList),))[0]
-            bestVar = (gene_id, chrom, pos, ref, alt, pvalue, study, tissue)
-            #print("TEST : ",bestVar)
-            return bestVar
-        except IndexError:
-            return abort(400)
+        cursor = conn.cursor()
+        row = cursor.execute(sqlCommand, tuple(argsList)).fetchone()
+    # Nothing matched the filters. Raised outside of the `with` block, so that the (read-only) query is not
+    #   rolled back as if it had failed
+    if row is None:
+        return abort(404)
+    (pip, study, tissue, gene_id, chrom, pos, ref, alt) = row
+    bestVar = (gene_id, chrom, pos, ref, alt, pip, study, tissue)
+    return bestVar
+
+
+@functools.lru_cache(maxsize=None)
+def _load_json_gz(path: str):
+    """
+    Parse a static, gzipped JSON lookup table. The result is cached and shared across requests,
+    so callers must treat it as read-only.
+    """
+    # The files are small enough to read in one go: a single read and a single decompress call avoid the
+    #   per-chunk overhead of streaming through a gzip file object
+    with open(path, "rb") as f:
+        return json_loads(gzip.decompress(f.read()))
+
+
+def get_tss_data():
+    """Get the signed TSS position of each gene (see locate_tss_data)"""
+    return _load_json_gz(locate_tss_data())
+
+
+@_memoize_path
+def locate_gene_names_data():
+    return os.path.join(_data_dir, "gene.id.symbol.map.json.gz")
 
 
 def get_gene_names_conversion():
-    """Get the compressed file containing two-way mappings of gene_id to gene_symbol"""
-    with gzip.open(
-        os.path.join(
-            current_app.config["FIVEX_DATA_DIR"], "gene.id.symbol.map.json.gz",
-        ),
-        "rt",
-    ) as f:
-        return json.loads(f.read())
+    """Get the two-way mappings of gene_id to gene_symbol"""
+    return _load_json_gz(locate_gene_names_data())
 
 
 # If requesting a single variant, then return the merged credible_sets file for a single chromosome
 # Otherwise, return the study-specific, tissue-specific file that contains genomewide information
+@_memoize_path
 def get_credible_interval_path(chrom, study=None, tissue=None, datatype="ge"):
-    # FIXME: Inject strict validation in callers before this ever hits this function
-    chrom = os.path.basename(chrom)
+    chrom = _validate(_CHROM_RE, chrom)
+    datatype = _validate(_NAME_RE, datatype)
 
     if not study and not tissue:
         # Overall "best" information
         return os.path.join(
-            current_app.config["FIVEX_DATA_DIR"],
-            "credible_sets",
+            _credible_sets_dir,
             datatype,
             f"chr{chrom}.{datatype}.credible_set.tsv.gz",
         )
     else:
-        # FIXME: Inject strict validation in callers before this ever hits this function
-        study = os.path.basename(study)
-        tissue = os.path.basename(tissue)
+        study = _validate(_NAME_RE, study)
+        tissue = _validate(_NAME_RE, tissue)
 
         return os.path.join(
-            current_app.config["FIVEX_DATA_DIR"],
-            "credible_sets",
+            _credible_sets_dir,
             datatype,
             study,
             f"{study}.{tissue}_{datatype}.purity_filtered.sorted.txt.gz",
@@ -206,34 +323,42 @@ def get_credible_interval_path(chrom, study=None, tissue=None, datatype="ge"):
 
 
 # Return the chromosome-specific filename for the merged credible sets data
+@_memoize_path
 def get_credible_data_table(chrom, datatype="ge"):
-    # FIXME: Inject strict validation in callers before this ever hits this function
-    chrom = os.path.basename(chrom)
+    chrom = _validate(_CHROM_RE, chrom)
+    datatype = _validate(_NAME_RE, datatype)
 
     return os.path.join(
-        current_app.config["FIVEX_DATA_DIR"],
-        "credible_sets",
+        _credible_sets_dir,
         datatype,
         f"chr{chrom}.{datatype}.credible_set.tsv.gz",
     )
 
 
-# Takes in chromosome and position, and returns (chrom, pos, ref, alt, rsid)
 # rsid.sqlite3.db is created by util/create.rsid.sqlite3.py
+@_memoize_path
+def locate_rsid_data():
+    return os.path.join(_data_dir, "rsid.sqlite3.db")
+
+
+# Takes in chromosome and position, and returns (chrom, pos, ref, alt, rsid)
 def return_rsid(chrom, pos):
-    rsid_db = os.path.join(
-        current_app.config["FIVEX_DATA_DIR"], "rsid.sqlite3.db"
-    )
-    conn = sqlite3.connect(rsid_db)
+    return _lookup_rsid(locate_rsid_data(), chrom, pos)
+
+
+# The same variants are looked up repeatedly (each page load, plus the views that link to it). Keyed on the database
+#   path, so that results are never shared between different data directories.
+@functools.lru_cache(maxsize=65536)
+def _lookup_rsid(rsid_db: str, chrom, pos):
+    conn = get_db_connection(rsid_db)
     with conn:
-        try:
-            cursor = conn.cursor()
-            return list(
-                cursor.execute(
-                    "SELECT * FROM rsidTable WHERE chrom=? AND pos=?",
-                    (chrom, pos),
-                )
-            )[0]
-        except ValueError:
-            # TODO: Document schema of the database table and what these placeholder values mean
-            return [chrom, pos, "N", "N", "Unknown"]
+        cursor = conn.cursor()
+        row = cursor.execute(
+            "SELECT chrom, pos, ref, alt, rsid FROM rsidTable"
+            " WHERE chrom=? AND pos=?",
+            (chrom, pos),
+        ).fetchone()
+    if row is None:
+        # TODO: Document schema of the database table and what these placeholder values mean
+        return (chrom, pos, "N", "N", "Unknown")
+    return row
@@ -110,6 +110,11 @@ class PheWASFIVEx extends PheWASLZ {
             filtered = filtered.filter((record) => study_names.has(record.study));
         }
 
+        // Add a synthetic field `studytissue`, used to group together points based on both study and tissue
+        filtered.forEach((record) => {
+            record.studytissue = `${record.study}-${record.tissue}`;
+        });
+
         // Add a synthetic field `top_value_rank`, where the best value for a given field gets rank 1.
         // This is used to show labels for only a few points with the strongest (y_field) value.
         // As this is a source designed to power functionality on one specific page, we can hardcode specific behavior
@@ -331,6 +331,11 @@ export function get_region_table_config() {
                     || a_data.position - b_data.position;
             },
             formatterParams: {
+                label: (cell) => {
+                    // The API sends a plain EPACTS ID; show it with the comma-delimited position used elsewhere
+                    const data = cell.getRow().getData();
+                    return `${data.chromosome}:${data.position.toLocaleString()}_${data.ref_allele}/${data.alt_allele}`;
+                },
                 url: (cell) => {
                     const data = cell.getRow().getData();
                     // FIXME: Region pages only handle eqtls at present, so we hardcode a link to the eqtl version of the page
@@ -35,6 +35,11 @@ def test_loads_region_bestvar(client):
     assert content["data"]["symbol"] == "AMIGO1"
 
 
+def test_region_bestvar_not_found(client):
+    url = url_for("api.region_query_bestvar", chrom="1", start=1, end=100)
+    assert client.get(url).status_code == 404
+
+
 @pytest.mark.skip(
     "Temporarily removed this functionality (specifying a gene) from our bestvar query"
 )
@@ -73,3 +78,33 @@ def test_variant_api_rejects_invalid_option(client):
         data_type="somethingsomething",
     )
     assert client.get(url).status_code == 200
+
+
+#####
+# Response encoding: orjson is an optional speedup, and must not change the response format
+def test_orjson_provider_preserves_response_format(app):
+    pytest.importorskip("orjson")
+    from fivex import OrjsonProvider
+
+    assert isinstance(app.json, OrjsonProvider)
+
+    data = {"b": 1, "a": {"d": 2, "c": 3}}
+    assert app.json.dumps(data) == '{"a":{"c":3,"d":2},"b":1}'
+
+    app.debug = True
+    with app.app_context():
+        response = app.json.response(data)
+    assert response.get_data(as_text=True) == (
+        '{\n  "a": {\n    "c": 3,\n    "d": 2\n  },\n  "b": 1\n}\n'
+    )
+
+
+def test_orjson_provider_writes_non_finite_floats_as_null(app):
+    pytest.importorskip("orjson")
+
+    # eg log_pvalue is infinite when p=0 (see VariantContainer.pvalue)
+    data = {"log_pvalue": float("inf"), "beta": float("nan")}
+    assert app.json.loads(app.json.dumps(data)) == {
+        "beta": None,
+        "log_pvalue": None,
+    }
@@ -0,0 +1,149 @@
+"""Test the parsers and containers used to serve variant data"""
+
+import dataclasses as dc
+
+import pytest
+from zorp import parser_utils, readers  # type: ignore
+
+from fivex import model
+from fivex.api.format import (
+    CIAdder,
+    CIParser,
+    _parse_pval_to_log,
+    is_significant_in_credible_set,
+    query_variants,
+)
+
+
+def test_variant_to_dict_matches_fields(app):
+    # `to_dict` is written out by hand for speed; make sure it never drifts from the container definition
+    variants = list(
+        query_variants(
+            chrom="1",
+            start=109274968,
+            rowstoskip=1,
+            end=109275968,
+            study="GTEx",
+            tissue="adipose_subcutaneous",
+        )
+    )
+    assert len(variants) > 0
+    for variant in variants:
+        expected = dc.asdict(variant)
+        expected["variant_id"] = variant.variant_id  # a calculated property
+        assert variant.to_dict() == expected
+
+
+def test_credible_set_to_dict_matches_fields(app):
+    reader = readers.TabixReader(
+        source=model.get_credible_data_table("1"),
+        parser=CIParser(study=None, tissue=None),
+        skip_rows=0,
+    )
+    rows = list(reader.fetch("1", 109274967, 109374969))
+    assert len(rows) > 0
+    for row in rows:
+        expected = dc.asdict(row)
+        expected["variant_id"] = row.variant_id  # a calculated property
+        assert row.to_dict() == expected
+
+
+def test_gene_filter_matches_unfiltered_query(app):
+    # Rows are discarded by a text match before parsing; this must not change which rows are returned
+    def region(**kwargs):
+        return list(
+            query_variants(
+                chrom="1",
+                start=109200000,
+                rowstoskip=1,
+                end=109300000,
+                study="GTEx",
+                tissue="adipose_subcutaneous",
+                **kwargs,
+            )
+        )
+
+    def key(variant):
+        # Credible set annotations legitimately depend on the gene filter; compare everything else
+        return (variant.variant_id, variant.gene_id, variant.log_pvalue)
+
+    gene_id = "ENSG00000134243"
+    expected = [key(v) for v in region() if v.gene_id == gene_id]
+    assert len(expected) > 0
+    assert [key(v) for v in region(gene_id=f"{gene_id}.1")] == expected
+
+
+@pytest.mark.parametrize(
+    "value", ["1", "0", "0.0", "1e-400", "5e-324", "NA", "", "nan", "0.05"]
+)
+def test_pval_fast_path_matches_zorp(value):
+    # The fast path must give the same result as the zorp parser it stands in for, including edge cases
+    expected = parser_utils.parse_pval_to_log(value, is_neg_log=False)
+    assert _parse_pval_to_log(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1.5", "-1"])
+def test_pval_out_of_range_is_rejected(value):
+    with pytest.raises(ValueError):
+        parser_utils.parse_pval_to_log(value, is_neg_log=False)
+    with pytest.raises(ValueError):
+        _parse_pval_to_log(value)
+
+
+def _ci_key(variant):
+    return (
+        variant.chromosome,
+        variant.position,
+        variant.ref_allele,
+        variant.alt_allele,
+        variant.study,
+        variant.tissue,
+        variant.gene_id,
+    )
+
+
+def test_credible_set_annotation_and_piponly_filter(app):
+    region = dict(
+        chrom="1",
+        start=109000000,
+        end=109100000,
+        study="GTEx",
+        tissue="adipose_subcutaneous",
+        gene_id="ENSG00000197780",
+    )
+    ci_adder = CIAdder(
+        model.get_credible_interval_path("1", "GTEx", "adipose_subcutaneous"),
+        **region,
+    )
+    assert len(ci_adder.ci_data) > 0
+
+    # Start from real rows, with the credible set statistics reset to the container defaults
+    variants = [
+        dc.replace(variant, cs_index="-", cs_size=0, pip=0.0)
+        for variant in query_variants(rowstoskip=1, **region)
+    ]
+    annotated = list(ci_adder.annotate(variants))
+    hits = [v for v in annotated if _ci_key(v) in ci_adder.ci_data]
+    misses = [v for v in annotated if _ci_key(v) not in ci_adder.ci_data]
+    assert len(hits) > 0 and len(misses) > 0
+    for variant in hits:
+        assert variant.cs_index == "L1"
+        assert variant.pip > 0.0
+        assert (
+            variant.cs_index,
+            variant.cs_size,
+            variant.pip,
+        ) == ci_adder.ci_data[_ci_key(variant)]
+    for variant in misses:
+        assert (variant.cs_index, variant.cs_size, variant.pip) == (
+            "-",
+            0,
+            0.0,
+        )
+
+    # piponly keeps only credible set members that are also genomewide significant
+    hit, miss = hits[0], misses[0]
+    assert is_significant_in_credible_set(dc.replace(hit, log_pvalue=8.0))
+    assert not is_significant_in_credible_set(dc.replace(hit, log_pvalue=5.0))
+    assert not is_significant_in_credible_set(dc.replace(hit, log_pvalue=None))
+    assert not is_significant_in_credible_set(dc.replace(miss, log_pvalue=8.0))
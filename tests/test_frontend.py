@@ -25,3 +25,15 @@ def test_loads_variant(client):
 def test_region_must_provide_query_params(client):
     url = url_for("frontend.region_view")
     assert client.get(url).status_code == 400
+
+
+def test_variant_missing_from_databases_uses_placeholders(client):
+    url = url_for("frontend.variant_view", chrom="1", pos=1)
+    response = client.get(url)
+    assert response.status_code == 200
+    content = response.get_json()
+    assert (content["ref"], content["alt"], content["rsid"]) == (
+        "N",
+        "N",
+        "Unknown",
+    )
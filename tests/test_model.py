@@ -0,0 +1,71 @@
+"""Test lookups against the reference datastores"""
+
+import threading
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from fivex import model
+
+
+def test_gene_names_are_loaded_once(app):
+    # The gene map is large and static; parsing it for every request would dominate response time
+    with app.test_request_context():
+        first = model.get_gene_names_conversion()
+    with app.test_request_context():
+        second = model.get_gene_names_conversion()
+    assert first is second
+    assert len(first) > 0
+
+
+@pytest.mark.parametrize(
+    "study,tissue", [("..", "adipose_subcutaneous"), ("GTEx", "../x")]
+)
+def test_paths_reject_unsafe_names(app, study, tissue):
+    with app.test_request_context():
+        with pytest.raises(BadRequest):
+            model.locate_study_tissue_data(study, tissue)
+
+
+def test_paths_validate_chromosome(app):
+    with app.test_request_context():
+        with pytest.raises(BadRequest):
+            model.get_credible_data_table("../1")
+        assert model.get_credible_data_table("X").endswith(
+            "chrX.ge.credible_set.tsv.gz"
+        )
+
+
+def test_paths_require_data_dir(monkeypatch):
+    # Outside of an app, paths must not silently resolve against the working directory
+    monkeypatch.setattr(model, "_data_dir", None)
+    with pytest.raises(RuntimeError):
+        model.locate_tss_data()
+
+
+def test_rsid_lookup_is_cached(app):
+    with app.test_request_context():
+        first = model.return_rsid("1", 109274968)
+        assert model.return_rsid("1", 109274968) is first
+        assert model.return_rsid("1", 1) == ("1", 1, "N", "N", "Unknown")
+
+
+def test_db_connection_is_shared_across_requests(app, client):
+    # Connections must outlive a single request, and be shared by every thread (or greenlet) that serves requests
+    with app.test_request_context():
+        path = model.get_best_per_variant_lookup()
+        first = model.get_db_connection(path)
+    assert client.get("/views/variant/1_109274968/").status_code == 200
+    with app.test_request_context():
+        assert model.get_db_connection(path) is first
+
+    results = []
+
+    def query_from_other_thread():
+        conn = model.get_db_connection(path)
+        results.append((conn, conn.execute("SELECT 1").fetchone()))
+
+    thread = threading.Thread(target=query_from_other_thread)
+    thread.start()
+    thread.join()
+    assert results == [(first, (1,))]